@@ -30,7 +30,7 @@ class Pipeless():
         # Initialize global configuration
         config = Config(_config)
 
-        update_logger_level(config.get_log_level())
+        update_logger_level(config.get_log_level_value())
 
         logger.info(f'Running component: {component}')
 
@@ -1,3 +1,4 @@
+import logging
 import os
 import sys
 
@@ -5,9 +6,22 @@ from pipeless_ai.lib.singleton import Singleton
 from pipeless_ai.lib.logger import logger
 
 ENV_PREFIX = 'PIPELESS'
-
-def prioritized_config(config, path, env_var_name, convert_to=str, required=False):
-    value = os.environ.get(env_var_name, None)
+LOG_LEVELS = {
+    'INFO': logging.INFO,
+    'DEBUG': logging.DEBUG,
+    'WARN': logging.WARNING,
+}
+# Snapshot of the environment. The configuration is only read at startup
+_ENV = dict(os.environ)
+# Hosts that refer to the local machine when listening
+_LOCAL_HOSTS = ('localhost', '127.0.0.1', '0.0.0.0')
+
+def _to_bool(value):
+    # bool('false') is True, parse the env var string instead
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+def prioritized_config(config, path, env_var_name, convert_to=str, required=False, default=None):
+    value = _ENV.get(env_var_name, None)
     if value is None:
         try:
             value = config[path]
@@ -15,12 +29,15 @@ def prioritized_config(config, path, env_var_name, convert_to=str, required=Fals
             if required:
                 logger.error(f'{env_var_name} env var or {path} in config file option is required!')
                 sys.exit(1)
+            value = default
     else:
         value = convert_to(value)
 
     return value
 
 class Address():
+    __slots__ = ('_host', '_port')
+
     def __init__(self, address_dict, env_prefix):
         self._host = prioritized_config(address_dict, 'host', f'{env_prefix}_HOST', required=True)
         self._port = prioritized_config(address_dict, 'port', f'{env_prefix}_PORT', required=True)
@@ -32,23 +49,27 @@ class Address():
         return f'{self._host}:{self._port}'
 
 class Video():
+    __slots__ = ('_enable', '_uri', '_protocol', '_location')
+
     def __init__(self, video_dict, env_prefix):
-        self._enable = prioritized_config(video_dict, 'enable', f'{env_prefix}_ENABLE', convert_to=bool, required=True)
+        self._enable = prioritized_config(video_dict, 'enable', f'{env_prefix}_ENABLE', convert_to=_to_bool, required=True)
         # NOTE: When output the URI is not required even if video is enabled.
         #       By default goes to the default video output (screen)
         self._uri = prioritized_config(video_dict, 'uri', f'{env_prefix}_URI', required=False)
-        if self._uri == 'screen':
+        if self._uri is None:
+            self._protocol = None
+            self._location = None
+        elif self._uri == 'screen':
             # To reproduce videos locally directly on the screen
             self._protocol = 'screen'
             self._location = 'screen'
         else:
-            try:
-                uri_split = self._uri.split(':')
-                self._protocol = uri_split[0]
-                self._location = uri_split[1]
-            except:
-                logger.error(f'Wrong or missing video URI config! Ensure it starts with the protocol. Example: "file://", "https://", etc')
+            protocol, sep, location = self._uri.partition('://')
+            if not sep or not protocol:
+                logger.error(f'Wrong video URI config: {self._uri}! Ensure it starts with the protocol. Example: "file://", "https://", etc')
                 sys.exit(1)
+            self._protocol = protocol
+            self._location = location
 
     def is_enabled(self):
         return self._enable
@@ -59,18 +80,90 @@ class Video():
     def get_uri_location(self):
         return self._location
 
+class InputVideo(Video):
+    __slots__ = ('_sync', '_drop', '_gpu_convert', '_pull_mode')
+
+    def __init__(self, video_dict, env_prefix):
+        super().__init__(video_dict, env_prefix)
+        # Synchronize the frames to the clock (real time) or process them as fast as possible
+        self._sync = prioritized_config(video_dict, 'sync', f'{env_prefix}_SYNC', convert_to=_to_bool, required=False, default=True)
+        # Drop old frames instead of blocking the decoder when the processing is slow
+        self._drop = prioritized_config(video_dict, 'drop', f'{env_prefix}_DROP', convert_to=_to_bool, required=False, default=False)
+        # Convert the color space on the GPU when a hardware converter is available.
+        # Only useful when the stream is decoded on the GPU, otherwise the frames are uploaded and downloaded again
+        self._gpu_convert = prioritized_config(video_dict, 'gpu_convert', f'{env_prefix}_GPU_CONVERT', convert_to=_to_bool, required=False, default=False)
+        # Pull the frames from a dedicated thread instead of using the appsink signals
+        self._pull_mode = prioritized_config(video_dict, 'pull_mode', f'{env_prefix}_PULL_MODE', convert_to=_to_bool, required=False, default=False)
+
+    def get_sync(self):
+        return self._sync
+    def get_drop(self):
+        return self._drop
+    def get_gpu_convert(self):
+        return self._gpu_convert
+    def get_pull_mode(self):
+        return self._pull_mode
+
 class Input():
+    __slots__ = ('_video', '_address', '_shared_memory', '_shared_memory_slots', '_free_slots_port', '_max_queued_frames', '_batch_size', '_batch_timeout_ms')
+
     def __init__(self, input_dict):
-        self._video = Video(input_dict['video'], f'{ENV_PREFIX}_INPUT_VIDEO')
+        self._video = InputVideo(input_dict['video'], f'{ENV_PREFIX}_INPUT_VIDEO')
+        if self._video.is_enabled() and self._video.get_uri() is None:
+            logger.error('Missing input video URI config!')
+            sys.exit(1)
         # Address where the output component is running
         self._address = Address(input_dict['address'], f'{ENV_PREFIX}_INPUT_ADDRESS')
+        # NOTE: Only valid when the workers run on the same machine than the input
+        self._shared_memory = prioritized_config(input_dict, 'shared_memory', f'{ENV_PREFIX}_INPUT_SHARED_MEMORY', convert_to=_to_bool, required=False, default=False)
+        # Max number of frames on the shared memory at the same time. Bounded by the free space of /dev/shm
+        self._shared_memory_slots = prioritized_config(input_dict, 'shared_memory_slots', f'{ENV_PREFIX}_INPUT_SHARED_MEMORY_SLOTS', convert_to=int, required=False, default=8)
+        if self._shared_memory_slots < 1:
+            logger.error(f'input.shared_memory_slots must be at least 1, got {self._shared_memory_slots}')
+            sys.exit(1)
+        # Port where the input receives the shared memory slots released by the workers.
+        # NOTE: port+2 is commonly used for the output
+        self._free_slots_port = prioritized_config(input_dict, 'free_slots_port', f'{ENV_PREFIX}_INPUT_FREE_SLOTS_PORT', convert_to=int, required=False, default=self._address.get_port() + 3)
+        # Frames waiting to be sent to the workers. Every queued frame adds latency
+        self._max_queued_frames = prioritized_config(input_dict, 'max_queued_frames', f'{ENV_PREFIX}_INPUT_MAX_QUEUED_FRAMES', convert_to=int, required=False, default=4)
+        if self._max_queued_frames < 1:
+            logger.error(f'input.max_queued_frames must be at least 1, got {self._max_queued_frames}')
+            sys.exit(1)
+        # Send up to batch_size frames on a single message to the workers
+        self._batch_size = prioritized_config(input_dict, 'batch_size', f'{ENV_PREFIX}_INPUT_BATCH_SIZE', convert_to=int, required=False, default=1)
+        # Max time to wait for a batch to be completed
+        self._batch_timeout_ms = prioritized_config(input_dict, 'batch_timeout_ms', f'{ENV_PREFIX}_INPUT_BATCH_TIMEOUT_MS', convert_to=int, required=False, default=10)
 
     def get_video(self):
         return self._video
     def get_address(self):
         return self._address
+    def is_shared_memory_enabled(self):
+        return self._shared_memory
+    def get_shared_memory_slots(self):
+        return self._shared_memory_slots
+    def get_free_slots_port(self):
+        return int(self._free_slots_port)
+    def get_listening_ports(self):
+        """
+        Returns the ports listened on the input host, by the input and the output components
+        """
+        port = self._address.get_port()
+        # port+1 is listened by the output for the input-output connection
+        ports = [(port, 'input.address.port'), (port + 1, 'input.address.port + 1')]
+        if self.is_shared_memory_enabled():
+            ports.append((self.get_free_slots_port(), 'input.free_slots_port'))
+        return ports
+    def get_max_queued_frames(self):
+        return self._max_queued_frames
+    def get_batch_size(self):
+        return self._batch_size
+    def get_batch_timeout_ms(self):
+        return self._batch_timeout_ms
 
 class Output():
+    __slots__ = ('_video', '_address')
+
     def __init__(self, output_dict):
         """
         When no output video URI is provided, the video is sent to the default
@@ -86,6 +179,8 @@ class Output():
         return self._address
 
 class Config(metaclass=Singleton):
+    __slots__ = ('_log_level', '_log_level_value', '_input', '_output', '_n_workers')
+
     def __init__(self, config):
         # TODO: parse config file path and delete mockup config
 
@@ -94,13 +189,37 @@ class Config(metaclass=Singleton):
         # A user can use a default config file and override via env vars the configuration that it needs
 
         self._log_level = prioritized_config(config, 'log_level', f'{ENV_PREFIX}_LOG_LEVEL', required=True)
-        if not self._log_level == 'INFO' and not self._log_level == 'DEBUG' and not self._log_level == 'WARN':
+        if self._log_level not in LOG_LEVELS:
             logger.warning(f'Unrecognized log level: {self._log_level}. Must be INFO, WARN or DEBUG. Falling back to DEBUG')
             self._log_level = 'DEBUG' # Changing this requires to change the default value in logger too.
+        self._log_level_value = LOG_LEVELS[self._log_level]
 
         self._input = Input(config['input'])
         self._output = Output(config['output'])
         self._n_workers = prioritized_config(config, 'n_workers', f'{ENV_PREFIX}_N_WORKERS', convert_to=int, required=True)
+        self._check_ports()
+
+    def _check_ports(self):
+        """
+        Ensures the ports derived from the input address do not collide
+        with each other nor with the output address
+        """
+        input_address = self._input.get_address()
+        input_ports = {}
+        for port, option in self._input.get_listening_ports():
+            if port in input_ports:
+                logger.error(f'The port {port} is used by both {input_ports[port]} and {option}. Change the input ports config')
+                sys.exit(1)
+            input_ports[port] = option
+
+        output_address = self._output.get_address()
+        input_host = input_address.get_host()
+        output_host = output_address.get_host()
+        same_host = input_host == output_host or (input_host in _LOCAL_HOSTS and output_host in _LOCAL_HOSTS)
+        output_port = output_address.get_port()
+        if same_host and output_port in input_ports:
+            logger.error(f'The output port {output_port} is already used by the input ({input_ports[output_port]}). Change the output.address.port config')
+            sys.exit(1)
 
     def get_input(self):
         return self._input
@@ -108,5 +227,10 @@ class Config(metaclass=Singleton):
         return self._output
     def get_log_level(self):
         return self._log_level
+    def get_log_level_value(self):
+        """
+        Numeric logging level, as defined by the logging module
+        """
+        return self._log_level_value
     def get_n_workers(self):
         return self._n_workers
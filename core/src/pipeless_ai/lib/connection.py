@@ -21,18 +21,21 @@ signal.signal(signal.SIGINT, exit)
 def send_error_handler(func):
     """
     Decorator to handle sending errors.
+    Returns whether the message was sent.
     """
     @wraps(func)
     def send_handler(*args, **kwargs):
         socket_name = args[0].get_socket_name()
         try:
             func(*args, **kwargs)
+            return True
         except Timeout:
             logger.warning(f"Timeout sending message on socket: {socket_name}")
+            return False
         except TryAgain:
             # For non-blocking calls
             logger.debug(f"[bright_yellow]No data written, try again on: {socket_name}[/bright_yellow]")
-            return None
+            return False
         except ClosedException as e:
             logger.error(f"Trying to write to a closed socket: {socket_name}")
             # Forward to ensure resource cleanup
@@ -117,6 +120,60 @@ class InputOutputSocket(metaclass=Singleton):
     def get_socket_name(self):
         return self._name
 
+class FreeSlotsSocket(metaclass=Singleton):
+    """
+    nng socket used by the workers to notify the input about
+    the shared memory slots that can be reused
+    """
+    def __init__(self, mode, timeout=1000):
+        """
+        Parameters:
+        - mode: 'w' for the workers (write). 'r' for the input (read)
+        """
+        config = Config(None) # Get the already existing config instance
+        address = config.get_input().get_address()
+        port = str(config.get_input().get_free_slots_port())
+        self._addr = f'tcp://{address.get_host()}:{port}'
+        if mode == 'w':
+            self._socket = Push0()
+            self._socket.send_timeout = timeout
+            self._name = 'FreeSlotsSocket-Write'
+
+            connected = False
+            while not connected:
+                try:
+                    self._socket.dial(self._addr, block=True)
+                    connected = True
+                except ConnectionRefused:
+                    logger.warning(f'[orange3]Connection to {self._addr} failed. Retrying...[/orange3]')
+                    time.sleep(1)
+        elif mode == 'r':
+            self._socket = Pull0(listen=self._addr)
+            self._socket.recv_timeout = timeout
+            self._name = 'FreeSlotsSocket-Read'
+        else:
+            raise ValueError('Wrong mode for FreeSlotsSocket')
+
+    @send_error_handler
+    def send(self, msg):
+        # Blocking send call. A lost message means a slot is never reused
+        self._socket.send(msg)
+
+    @recv_error_handler
+    def recv(self):
+        return self._socket.recv(block=False)
+
+    @recv_error_handler
+    def wait_recv(self):
+        # Blocking receive (until the recv timeout), used when all the slots are in use
+        return self._socket.recv()
+
+    def close(self):
+        self._socket.close()
+
+    def get_socket_name(self):
+        return self._name
+
 class InputPushSocket(metaclass=Singleton):
     """
     nng push socket to push messages from the input to the workers
@@ -138,7 +195,7 @@ class InputPushSocket(metaclass=Singleton):
 
     @send_error_handler
     def ensure_send(self, msg):
-        # Blocking send, we must be sure the message is sent
+        # Blocking send (until the send timeout), we must be sure the message is sent
         self._socket.send(msg)
 
     def close(self):
@@ -0,0 +1,74 @@
+import ctypes
+import ctypes.util
+import numpy as np
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+class GstMapInfo(ctypes.Structure):
+    """
+    Mirror of the GstMapInfo C struct.
+    Ref: https://gstreamer.freedesktop.org/documentation/gstreamer/gstmemory.html#GstMapInfo
+    """
+    _fields_ = [
+        ("memory", ctypes.c_void_p),
+        ("flags", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("size", ctypes.c_size_t),
+        ("maxsize", ctypes.c_size_t),
+        ("user_data", ctypes.c_void_p * 4),
+        ("_gst_reserved", ctypes.c_void_p * 4),
+    ]
+
+_libgst = ctypes.CDLL(ctypes.util.find_library('gstreamer-1.0') or 'libgstreamer-1.0.so.0')
+_libgst.gst_buffer_map.argtypes = [ctypes.c_void_p, ctypes.POINTER(GstMapInfo), ctypes.c_int]
+_libgst.gst_buffer_map.restype = ctypes.c_int
+_libgst.gst_buffer_unmap.argtypes = [ctypes.c_void_p, ctypes.POINTER(GstMapInfo)]
+_libgst.gst_buffer_unmap.restype = None
+
+class GstBufferMapping():
+    """
+    Keeps a Gst.Buffer referenced and mapped while this object is alive.
+    """
+    def __init__(self, buffer: Gst.Buffer, flags: Gst.MapFlags = Gst.MapFlags.READ):
+        self._mapped = False
+        self._buffer = buffer
+        # PyGObject boxed types hash to the address of the wrapped C struct
+        self._buffer_ptr = hash(buffer)
+        self._mapinfo = GstMapInfo()
+        if not _libgst.gst_buffer_map(self._buffer_ptr, ctypes.byref(self._mapinfo), int(flags)):
+            raise BufferError('Unable to map the Gst.Buffer memory')
+        self._mapped = True
+
+    def get_data(self):
+        """
+        Returns a ctypes array over the mapped memory.
+        The array holds a reference to the mapping.
+        """
+        data = (ctypes.c_uint8 * self._mapinfo.size).from_address(self._mapinfo.data)
+        data._gst_mapping = self
+        return data
+
+    def __del__(self):
+        if self._mapped:
+            self._mapped = False
+            _libgst.gst_buffer_unmap(self._buffer_ptr, ctypes.byref(self._mapinfo))
+
+def map_gst_buffer(buffer: Gst.Buffer, shape, flags: Gst.MapFlags = Gst.MapFlags.READ) -> np.ndarray:
+    """
+    Maps the buffer memory into an uint8 array with the provided shape.
+    Unlike buffer.map(), PyGObject does not copy the data into a bytes object.
+    The buffer stays mapped until the array and every view of it are released:
+    numpy makes the views point to the same base object, which references the mapping.
+    """
+    data = GstBufferMapping(buffer, flags).get_data()
+    try:
+        array = np.ndarray(shape=shape, dtype=np.uint8, buffer=data)
+    except TypeError as e:
+        # The buffer is smaller than the requested shape
+        raise BufferError(str(e))
+
+    if not flags & Gst.MapFlags.WRITE:
+        array.flags.writeable = False
+    return array
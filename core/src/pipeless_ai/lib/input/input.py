@@ -1,6 +1,11 @@
+from collections import deque
+import functools
+import logging
+import queue
 import sys
+import threading
+import time
 import traceback
-import numpy as np
 
 import gi
 gi.require_version('GLib', '2.0')
@@ -10,93 +15,369 @@ gi.require_version('GstApp', '1.0')
 from gi.repository import Gst, GObject, GstApp, GLib
 
 from pipeless_ai.lib.logger import logger, update_logger_component
-from pipeless_ai.lib.connection import InputOutputSocket, InputPushSocket
+from pipeless_ai.lib.connection import FreeSlotsSocket, InputOutputSocket, InputPushSocket
 from pipeless_ai.lib.config import Config
-from pipeless_ai.lib.messages import EndOfStreamMsg, RgbImageMsg, StreamCapsMsg, StreamTagsMsg
+from pipeless_ai.lib.messages import EndOfStreamMsg, FrameBatchMsg, RgbImageMsg, SharedRgbImageMsg, StreamCapsMsg, StreamTagsMsg, deserialize
+from pipeless_ai.lib.shm import FrameRing
+from pipeless_ai.lib.input.gst_buffer import map_gst_buffer
 
-def on_new_sample(sink: GstApp.AppSink) -> Gst.FlowReturn:
-    sample = sink.pull_sample()
-    if sample is None:
-        logger.error('Sample is None!')
-        return Gst.FlowReturn.ERROR # TODO: We should return a different status if we want to leave the app running forever and being able to recover from flows
+# Control items of the FrameSender queue
+_STOP = object() # Stops the sender thread
+_EOS = object() # Notifies the end of the stream after the queued frames
 
-    logger.debug(f'Sample caps: {sample.get_caps()}')
+class FrameQueue():
+    """
+    Bounded queue of the frames waiting to be sent.
+    Frames are queued as tuples. The control items are never dropped
+    and do not count for the queue size.
+    """
+    def __init__(self, max_frames):
+        self._items = deque()
+        self._max_frames = max_frames
+        self._n_frames = 0
+        self._cond = threading.Condition()
+
+    def put_frame(self, item, drop=False):
+        """
+        Waits until there is room for the frame or,
+        if drop is set, drops the oldest queued frame
+        """
+        with self._cond:
+            if drop and self._n_frames >= self._max_frames:
+                for idx, queued in enumerate(self._items):
+                    if isinstance(queued, tuple):
+                        # The dropped frame buffer is unmapped once released
+                        del self._items[idx]
+                        self._n_frames -= 1
+                        logger.debug('Workers are too slow. Dropping oldest queued frame')
+                        break
+            self._cond.wait_for(lambda: self._n_frames < self._max_frames)
+            self._items.append(item)
+            self._n_frames += 1
+            self._cond.notify_all()
+
+    def put_control(self, item):
+        with self._cond:
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """
+        Returns the oldest item. Raises queue.Empty when there are no items after the timeout
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout):
+                raise queue.Empty
+            item = self._items.popleft()
+            if isinstance(item, tuple):
+                self._n_frames -= 1
+                self._cond.notify_all()
+            return item
+
+class FrameSender():
+    """
+    Sends the frames to the workers from a dedicated thread, so the GStreamer
+    streaming thread never blocks copying the frames or on the sockets.
+    The queued frames keep their Gst.Buffer mapped until they are copied
+    into the message (or the shared memory ring) and released.
+    When the queue is full, the streaming thread waits for the sender
+    (backpressure to the decoder) or, if drop is enabled, the oldest frame is dropped.
+    In the same way, with shared memory the sender waits for the workers to release
+    a slot, or drops the frame if drop is enabled.
+    Up to batch_size frames are sent on a single message. A batch is sent
+    when it is complete or batch_timeout seconds after its first frame.
+    The end of stream is sent once every frame queued before it was sent.
+    """
+    def __init__(self, push_socket, output_socket, n_workers, ring=None, free_slots_socket=None, max_queued=4, drop=False, batch_size=1, batch_timeout=0.01):
+        self._push_socket = push_socket
+        self._output_socket = output_socket
+        self._n_workers = n_workers
+        self._ring = ring
+        self._free_slots_socket = free_slots_socket
+        self._drop = drop
+        self._batch_size = batch_size
+        self._batch_timeout = batch_timeout
+        self._queue = FrameQueue(max_queued)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='FrameSender', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+        self._queue.put_control(_STOP)
+        self._thread.join()
+
+    def put(self, frame, dts, pts, duration):
+        self._queue.put_frame((frame, dts, pts, duration), self._drop)
+
+    def send_eos(self):
+        """
+        Queues the end of stream notification
+        """
+        self._queue.put_control(_EOS)
+
+    def _send_eos(self):
+        s_msg = EndOfStreamMsg().serialize()
+        logger.debug('Notifying EOS to output')
+        self._output_socket.send(s_msg)
+        for _ in range(self._n_workers):
+            # The socket is round robin, send one to every worker.
+            # Each of them receives it after the frames pushed to it.
+            logger.info('Notifying EOS to worker')
+            self._push_socket.ensure_send(s_msg)
+
+    def _release_slots(self, block=False):
+        """
+        Recovers the slots the workers finished with
+        """
+        if block:
+            s_msg = self._free_slots_socket.wait_recv()
+            if s_msg is None:
+                return
+            msg = deserialize(s_msg)
+            self._ring.release(msg.get_shm_name(), msg.get_ticket())
+        for s_msg in iter(self._free_slots_socket.recv, None):
+            msg = deserialize(s_msg)
+            self._ring.release(msg.get_shm_name(), msg.get_ticket())
+
+    def _acquire_slot(self):
+        """
+        Returns the name and ticket of a free slot of the ring, or None
+        when all of them are in use and drop is enabled
+        """
+        self._release_slots()
+        slot = self._ring.acquire()
+        while slot is None and not self._drop and not self._stopping.is_set():
+            self._release_slots(block=True)
+            slot = self._ring.acquire()
+        return slot
+
+    def _create_shared_msg(self, frame, dts, pts, duration):
+        """
+        Copies the frame into a slot of the shared memory ring.
+        Returns the message for the workers or None when
+        there are no free slots and the frame has to be dropped.
+        """
+        height, width, _ = frame.shape
+        try:
+            frame_size = self._ring.set_frame_shape(height, width)
+        except MemoryError as e:
+            logger.error(f'{e}. Sending the frames through the sockets instead')
+            self._ring.close()
+            self._ring = None
+            return RgbImageMsg(width, height, frame, dts, pts, duration)
+
+        slot = self._acquire_slot()
+        if slot is None:
+            logger.debug('No free shared memory slots. Dropping frame')
+            return None
+        slot_name, ticket = slot
+        self._ring.write(slot_name, frame.ctypes.data, frame_size)
+        return SharedRgbImageMsg(width, height, slot_name, ticket, dts, pts, duration)
+
+    def _create_msg(self, item):
+        """
+        Returns the message for the frame, or None if the frame was dropped.
+        With shared memory the frame is copied into the ring, otherwise
+        the message references the frame until it is serialized.
+        """
+        frame, dts, pts, duration = item
+        if self._ring is None:
+            height, width, _ = frame.shape
+            return RgbImageMsg(width, height, frame, dts, pts, duration)
+        return self._create_shared_msg(frame, dts, pts, duration)
+
+    def _send(self, batch):
+        msgs = [self._create_msg(item) for item in batch]
+        batch.clear()
+        msgs = [msg for msg in msgs if msg is not None]
+        if not msgs:
+            return
+
+        if len(msgs) == 1:
+            s_msg = msgs[0].serialize()
+        else:
+            s_msg = FrameBatchMsg(msgs).serialize()
+        slots = [(msg.get_shm_name(), msg.get_ticket()) for msg in msgs if isinstance(msg, SharedRgbImageMsg)]
+        # Release the frames, unmapping their buffers
+        msgs = None
+        if not self._push_socket.ensure_send(s_msg):
+            for slot_name, ticket in slots:
+                # No worker will process the frame, the slot can be reused
+                self._ring.release(slot_name, ticket)
+
+    def _fill_batch(self, batch):
+        """
+        Adds the queued frames to the batch until it is complete or the timeout expires.
+        Returns the control item found on the queue, if any, to be handled after the batch.
+        """
+        deadline = time.monotonic() + self._batch_timeout
+        while len(batch) < self._batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if not isinstance(item, tuple):
+                return item
+            batch.append(item)
+        return None
+
+    def _run(self):
+        item = self._queue.get()
+        while item is not _STOP:
+            next_item = None
+            if item is _EOS:
+                self._send_eos()
+            else:
+                batch = [item]
+                item = None # Only the batch references the frames
+                next_item = self._fill_batch(batch)
+                self._send(batch)
+            item = next_item if next_item is not None else self._queue.get()
+
+# Frame dimensions of the last caps seen on the appsink.
+# The caps only change between streams, avoid parsing them on every frame.
+_caps_cache = {'caps': None, 'ptr': 0, 'width': 0, 'height': 0}
+
+def get_frame_dimensions(caps: Gst.Caps):
+    """
+    Returns the width and height from the caps.
+    The caps structure is only parsed when the caps change.
+    """
+    # PyGObject boxed types hash to the address of the wrapped C struct.
+    # The cached caps are kept referenced, so their address is not reused by new caps.
+    caps_ptr = hash(caps)
+    if caps_ptr != _caps_cache['ptr'] or _caps_cache['caps'] is None:
+        structure = caps.get_structure(0)
+        _caps_cache['width'] = structure.get_value("width")
+        _caps_cache['height'] = structure.get_value("height")
+        _caps_cache['caps'] = caps
+        _caps_cache['ptr'] = caps_ptr
+    return _caps_cache['width'], _caps_cache['height']
+
+def process_sample(sample: Gst.Sample, sender: FrameSender) -> Gst.FlowReturn:
+    """
+    The frame sender is received as argument to avoid
+    retrieving the sockets singletons on every frame.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('Sample caps: %s', sample.get_caps())
 
     buffer = sample.get_buffer()
     if buffer is None:
         logger.error('Buffer is None!')
         return Gst.FlowReturn.ERROR
 
-    # Get multimedia data from the buffer
-    success, info = buffer.map(Gst.MapFlags.READ)
-    if not success:
-        logger.error('Getting multimedia data from the buffer did not success.')
-        return Gst.FlowReturn.ERROR
+    width, height = get_frame_dimensions(sample.get_caps())
 
-    caps = sample.get_caps()
-    width = caps.get_structure(0).get_value("width")
-    height = caps.get_structure(0).get_value("height")
-    dts = buffer.dts
-    pts = buffer.pts
-    duration = buffer.duration
-    ndframe = np.ndarray(
-        shape=(height, width, 3),
-        dtype=np.uint8, buffer=info.data
-    )
+    # Get multimedia data from the buffer without copying it.
+    # The buffer remains mapped until the sender releases the frame
+    try:
+        frame = map_gst_buffer(buffer, (height, width, 3), Gst.MapFlags.READ)
+    except BufferError as e:
+        logger.error(f'Getting multimedia data from the buffer did not success: {e}')
+        return Gst.FlowReturn.ERROR
 
-    msg = RgbImageMsg(width, height, ndframe, dts, pts, duration)
-    s_msg = msg.serialize()
+    # Pass the frame to the workers
+    sender.put(frame, buffer.dts, buffer.pts, buffer.duration)
 
-    # Pass msg to the workers
-    s_push = InputPushSocket()
-    s_push.send(s_msg)
+    return Gst.FlowReturn.OK
 
-    # Release resources
-    buffer.unmap(info)
+def on_new_sample(sink: GstApp.AppSink, sender: FrameSender) -> Gst.FlowReturn:
+    sample = sink.pull_sample()
+    if sample is None:
+        logger.error('Sample is None!')
+        return Gst.FlowReturn.ERROR # TODO: We should return a different status if we want to leave the app running forever and being able to recover from flows
 
-    return Gst.FlowReturn.OK
+    return process_sample(sample, sender)
 
-def on_bus_message(bus: Gst.Bus, msg: Gst.Message, loop: GObject.MainLoop):
+class SamplePuller():
+    """
+    Pulls the samples from the appsink on a dedicated thread instead of
+    emitting the new-sample signal for every frame.
+    """
+    def __init__(self, appsink: GstApp.AppSink, sender: FrameSender, timeout=100 * Gst.MSECOND):
+        self._appsink = appsink
+        self._sender = sender
+        # Finite timeout to be able to stop the thread
+        self._timeout = timeout
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='SamplePuller', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            sample = self._appsink.try_pull_sample(self._timeout)
+            if sample is None:
+                if self._appsink.is_eos():
+                    break
+                continue
+            if process_sample(sample, self._sender) == Gst.FlowReturn.ERROR:
+                # Stop the pipeline as when the new-sample signal returns an error
+                error = GLib.Error.new_literal(Gst.stream_error_quark(), 'Failed to process sample', Gst.StreamError.FAILED)
+                self._appsink.post_message(Gst.Message.new_error(self._appsink, error, 'Pulled sample processing failed'))
+                break
+
+def on_eos_message(msg: Gst.Message, loop: GObject.MainLoop, m_socket, sender: FrameSender):
+    logger.info("End of stream reached.")
+    # Notify the output and the workers after the frames still queued
+    sender.send_eos()
+
+def on_error_message(msg: Gst.Message, loop: GObject.MainLoop, m_socket, sender: FrameSender):
+    err, debug = msg.parse_error()
+    logger.error(f"Error received from element {msg.src.get_name()}: {err.message}")
+    logger.error(f"Debugging information: {debug if debug else 'none'}")
+    loop.quit()
+
+def on_warning_message(msg: Gst.Message, loop: GObject.MainLoop, m_socket, sender: FrameSender):
+    err, debug = msg.parse_warning()
+    logger.warning(f"Warning received from element {msg.src.get_name()}: {err.message}")
+    logger.warning(f"Debugging information: {debug if debug else 'none'}")
+
+def on_state_changed_message(msg: Gst.Message, loop: GObject.MainLoop, m_socket, sender: FrameSender):
+    old_state, new_state, pending_state = msg.parse_state_changed()
+    logger.debug('New pipeline state: %s', new_state)
+
+def on_tag_message(msg: Gst.Message, loop: GObject.MainLoop, m_socket, sender: FrameSender):
+    tags = msg.parse_tag().to_string()
+    logger.info('Tags parsed: %s', tags)
+    t_msg = StreamTagsMsg(tags)
+    m_socket.send(t_msg.serialize())
+
+def on_ignored_message(msg: Gst.Message, loop: GObject.MainLoop, m_socket, sender: FrameSender):
+    pass
+
+BUS_MESSAGE_HANDLERS = {
+    Gst.MessageType.EOS: on_eos_message,
+    Gst.MessageType.ERROR: on_error_message,
+    Gst.MessageType.WARNING: on_warning_message,
+    Gst.MessageType.STATE_CHANGED: on_state_changed_message,
+    Gst.MessageType.TAG: on_tag_message,
+}
+
+def on_bus_message(bus: Gst.Bus, msg: Gst.Message, loop: GObject.MainLoop, m_socket, sender: FrameSender):
     """
     Callback to manage bus messages
     For example, when we receive a new-sample and return an error from
     the processing, we can catch it and stop the pipeline here.
     """
     mtype = msg.type
-    if mtype == Gst.MessageType.EOS:
-        logger.info("End of stream reached.")
-        m_socket = InputOutputSocket('w')
-        w_socket = InputPushSocket()
-        m_msg = EndOfStreamMsg()
-        m_msg = m_msg.serialize()
-        logger.debug('Notifying EOS to output')
-        m_socket.send(m_msg) # Notify output
-        config = Config(None)
-        for _ in range(config.get_n_workers()):
-            # The socket is round robin, send to all workers
-            # TODO: a broadcast socket for this is better for scaling
-            #       by saving the n_workers config option
-            logger.info('Notifying EOS to worker')
-            w_socket.ensure_send(m_msg)
-    elif mtype == Gst.MessageType.ERROR:
-        err, debug = msg.parse_error()
-        logger.error(f"Error received from element {msg.src.get_name()}: {err.message}")
-        logger.error(f"Debugging information: {debug if debug else 'none'}")
-        loop.quit()
-    elif mtype == Gst.MessageType.WARNING:
-        err, debug = msg.parse_warning()
-        logger.warning(f"Warning received from element {msg.src.get_name()}: {err.message}")
-        logger.warning(f"Debugging information: {debug if debug else 'none'}")
-    elif mtype == Gst.MessageType.STATE_CHANGED:
-        old_state, new_state, pending_state = msg.parse_state_changed()
-        logger.debug(f'New pipeline state: {new_state}')
-    elif mtype == Gst.MessageType.TAG:
-        tags = msg.parse_tag().to_string()
-        logger.info(f'Tags parsed: {tags}')
-        t_socket = InputOutputSocket('w')
-        t_msg = StreamTagsMsg(tags)
-        t_socket.send(t_msg.serialize())
+    # Every element of the pipeline posts state changes, they are only logged on debug
+    if mtype == Gst.MessageType.STATE_CHANGED and not logger.isEnabledFor(logging.DEBUG):
+        return True
 
+    BUS_MESSAGE_HANDLERS.get(mtype, on_ignored_message)(msg, loop, m_socket, sender)
     return True
 
 def on_pad_upstream_event(pad, info, user_data):
@@ -129,68 +410,111 @@ def on_pad_added(element, pad, *callbacks):
     for callback in callbacks:
         callback(pad)
 
-def input():
-    # Load config
-    config = Config(None)
-    Gst.init(None)
+# Elements able to convert the color space on the GPU, by priority
+GPU_CONVERTERS = ['nvvidconv', 'vaapipostproc']
 
-    update_logger_component('INPUT')
+def get_converter_description(gpu_convert):
+    """
+    Returns the pipeline description of the elements in charge of
+    converting the decoded frames to RGB.
+    When a GPU converter is available, the color space conversion is done
+    on the GPU and videoconvert just packs the RGBA/BGRx output into RGB.
+    """
+    if not Gst.ElementFactory.find('videoconvert'):
+        logger.error('Failed to find videoconvert')
+        sys.exit(1)
 
-    logger.info(f"Reading video from {config.get_input().get_video().get_uri()}")
-    pipeline = Gst.Pipeline.new("pipeline")
+    factory_name = None
+    if gpu_convert:
+        factory_name = next((name for name in GPU_CONVERTERS if Gst.ElementFactory.find(name)), None)
+    if factory_name is None:
+        return 'videoconvert name=videoconvert'
+
+    logger.info(f'Converting color space on the GPU with {factory_name}')
+    return (
+        f'{factory_name} name=gpuconvert'
+        ' ! capsfilter caps="video/x-raw,format=(string){RGBA,BGRx}"'
+        ' ! videoconvert name=videoconvert'
+    )
 
-    # Create elements
-    # We will force RBG on the sink and videoconvert takes care of
+def get_pipeline_description(uri, input_video):
+    """
+    The whole pipeline is created, linked and configured
+    by GStreamer from the returned description.
+    """
+    escaped_uri = uri.replace('\\', '\\\\').replace('"', '\\"')
+    converter = get_converter_description(input_video.get_gpu_convert())
+    # We will force RBG on the sink and the converter takes care of
     # converting between space colors negotiating caps automatically.
     # Ref: https://gstreamer.freedesktop.org/documentation/tutorials/basic/handy-elements.html?gi-language=c#videoconvert
-    uridecodebin = Gst.ElementFactory.make("uridecodebin3", "uridecodebin")
-    videoconvert = Gst.ElementFactory.make("videoconvert", "videoconvert")
-    appsink = Gst.ElementFactory.make("appsink", "appsink")
-
-    if not pipeline:
-        logger.error('Failed to create pipeline')
-        sys.exit(1)
-    if not uridecodebin:
-        logger.error('Failed to create uridecodebin')
-        sys.exit(1)
-    if not videoconvert:
-        logger.error('Failed to create videoconvert')
-        sys.exit(1)
-    if not appsink:
-        logger.error("Failed to create appsink.")
-        sys.exit(1)
+    # The sink keeps a single frame queued to bound the memory and the latency
+    # uridecodebin creates pads for each stream found in the uri (ex: video, audio, subtitles),
+    # they are linked to the converter when they appear.
+    return (
+        f'uridecodebin3 name=uridecodebin uri="{escaped_uri}"'
+        f' ! {converter}'
+        f' ! appsink name=appsink max-buffers=1'
+        f' emit-signals={str(not input_video.get_pull_mode()).lower()}'
+        f' drop={str(input_video.get_drop()).lower()}'
+        f' sync={str(input_video.get_sync()).lower()}'
+        f' caps="video/x-raw,format=RGB"'
+    )
 
-    # Set properties for elements
-    appsink.set_property("emit-signals", True)
-    appsink.connect("new-sample", on_new_sample)
-    # Force RGB output in sink
-    caps = Gst.Caps.from_string("video/x-raw,format=RGB")
-    appsink.set_property("caps", caps)
+def input():
+    # Load config
+    config = Config(None)
+    Gst.init(None)
 
-    # Add elemets to the pipeline
-    for elem in [uridecodebin, videoconvert, appsink]: pipeline.add(elem)
+    update_logger_component('INPUT')
 
-    # Link static elements (fixed number of pads): uridecoder (linked later) -> videoconvert -> appsink
-    if not videoconvert.link(appsink):
-        logger.error("Failed to link appsink to videoconvert")
+    input_video = config.get_input().get_video()
+    if not input_video.is_enabled():
+        logger.info('Video input disabled. Skipping pipeline creation')
+        return
+
+    input_uri = input_video.get_uri()
+    logger.info(f"Reading video from {input_uri}")
+
+    # Start socket to wait all components connections
+    s_push = InputPushSocket() # Listener
+    m_socket = InputOutputSocket('w') # Waits for output
+    ring = None
+    f_socket = None
+    if config.get_input().is_shared_memory_enabled():
+        ring = FrameRing(config.get_input().get_shared_memory_slots())
+        f_socket = FreeSlotsSocket('r') # Listener
+
+    pipeline_description = get_pipeline_description(input_uri, input_video)
+    logger.debug(f'Creating pipeline: {pipeline_description}')
+    try:
+        pipeline = Gst.parse_launch(pipeline_description)
+    except GLib.Error as e:
+        logger.error(f'Failed to create pipeline: {e.message}')
         sys.exit(1)
 
-    videoconvert_sink_pad = videoconvert.get_static_pad("sink")
-    # Link dynamic elements (dynamic number of pads)
-    # uridecodebin creates pads for each stream found in the uri (ex: video, audio, subtitles)
-    uridecodebin.set_property("uri", config.get_input().get_video().get_uri())
-    def pad_added_callback(pad):
-        if not videoconvert_sink_pad.is_linked():
-            logger.info('Linking uridecoderbin pad to videoconvert pad')
-            pad.link(videoconvert_sink_pad) # uridecoder -> videoconvert -> appsink
-        else:
-            logger.warning('Video converter pad is already linked. Skipping uridecoder link')
+    uridecodebin = pipeline.get_by_name('uridecodebin')
+    appsink = pipeline.get_by_name('appsink')
 
+    sender = FrameSender(
+        s_push, m_socket, config.get_n_workers(), ring, f_socket,
+        max_queued=config.get_input().get_max_queued_frames(),
+        drop=input_video.get_drop(),
+        batch_size=config.get_input().get_batch_size(),
+        batch_timeout=config.get_input().get_batch_timeout_ms() / 1000
+    )
+    puller = None
+    if input_video.get_pull_mode():
+        puller = SamplePuller(appsink, sender)
+    else:
+        on_sample = functools.partial(on_new_sample, sender=sender)
+        appsink.connect("new-sample", on_sample)
+
+    # Notify the output about the caps of each new stream
     uridecodebin.connect(
         "pad-added",
         lambda element, pad:
           on_pad_added(
-            element, pad, pad_added_callback, handle_caps_change
+            element, pad, handle_caps_change
         )
     )
 
@@ -199,23 +523,25 @@ def input():
     # Handle bus events on the main loop
     bus = pipeline.get_bus()
     bus.add_signal_watch()
-    bus.connect("message", on_bus_message, loop)
+    bus.connect(
+        "message",
+        functools.partial(on_bus_message, loop=loop, m_socket=m_socket, sender=sender)
+    )
 
     logger.info('Starting pipeline')
+    sender.start()
     ret = pipeline.set_state(Gst.State.PLAYING)
     if ret == Gst.StateChangeReturn.FAILURE:
         logger.error("[red]Unable to set the pipeline to the playing state.[/red]")
         sys.exit(1)
+    if puller is not None:
+        puller.start()
 
     try:
         logger.debug(f'uridecodebin state: {uridecodebin.get_state(5)}')
-        logger.debug(f'videoconverter state: {videoconvert.get_state(5)}')
+        logger.debug(f'videoconvert state: {pipeline.get_by_name("videoconvert").get_state(5)}')
         logger.debug(f'appsink state: {appsink.get_state(5)}')
 
-        # Start socket to wait all components connections
-        s_push  = InputPushSocket() # Listener
-        m_socket = InputOutputSocket('w') # Waits for output
-
         loop.run()
     except KeyboardInterrupt:
         pass
@@ -226,8 +552,11 @@ def input():
         logger.info('Closing pipeline')
         pipeline.set_state(Gst.State.NULL)
         logger.info('Pipeline closed')
-        # Rettreive and close the sockets
-        m_socket = InputOutputSocket('w')
+        if puller is not None:
+            puller.stop()
+        sender.stop()
         m_socket.close()
-        s_push  = InputPushSocket()
         s_push.close()
+        if ring is not None:
+            f_socket.close()
+            ring.close()
@@ -1,4 +1,5 @@
 import pickle
+import struct
 from enum import Enum
 import numpy as np
 
@@ -9,6 +10,17 @@ class MsgType(Enum):
     RGB_IMAGE = 2
     EOS = 3 # End of streams
     TAGS = 4
+    SHARED_RGB_IMAGE = 5
+    FRAME_BATCH = 6
+
+# Frame messages are sent for every frame. Instead of pickling them
+# they use a fixed binary header: type, width, height, dts, pts, duration.
+# The type goes first to distinguish them from the pickled messages.
+_FRAME_HEADER = struct.Struct('<BIIQQQ')
+# The shared frames header also contains the shared memory slot name and ticket
+_SHARED_FRAME_HEADER = struct.Struct('<BIIQQQ32sQ')
+# Batches contain the number of frames followed by the size of each frame message
+_BATCH_HEADER = struct.Struct('<BI')
 
 class Msg():
     """
@@ -76,24 +88,24 @@ class RgbImageMsg(Msg):
         self._data = raw_data
 
     def serialize(self):
+        # Single copy of the frame data into the message
+        return b''.join(self.serialize_parts())
+
+    def serialize_parts(self):
+        """
+        Returns the header and a view over the frame data, without copying it
+        """
         s_data = self._data
-        if isinstance(self._data, np.ndarray):
-            s_data = self._data.dumps()
-        return pickle.dumps({
-            "type": self._type,
-            "dts": self._dts,
-            "pts": self._pts,
-            "duration": self._duration,
-            "width": self._width,
-            "height": self._height,
-            "data": s_data
-        })
+        if isinstance(s_data, np.ndarray):
+            s_data = np.ascontiguousarray(s_data)
+        header = _FRAME_HEADER.pack(
+            self._type.value, self._width, self._height,
+            self._dts, self._pts, self._duration
+        )
+        return [header, memoryview(s_data).cast('B')]
 
     def update_data(self, new_data):
-        if isinstance(new_data, np.ndarray):
-            self._data = new_data.dumps()
-        else:
-            self._data = new_data
+        self._data = new_data
 
     def get_width(self):
         return self._width
@@ -106,27 +118,94 @@ class RgbImageMsg(Msg):
     def get_duration(self):
         return self._duration
 
+class SharedRgbImageMsg(Msg):
+    """
+    Raw RGB image information. The image data lives on a shared memory slot.
+    The ticket identifies the use of the slot, it changes every time the slot is reused.
+    """
+    def __init__(self, width, height, shm_name, ticket, dts, pts, duration):
+        self._type = MsgType.SHARED_RGB_IMAGE
+        self._dts = dts
+        self._pts = pts
+        self._duration = duration
+        self._width = width
+        self._height = height
+        self._shm_name = shm_name
+        self._ticket = ticket
+
+    def serialize(self):
+        return _SHARED_FRAME_HEADER.pack(
+            self._type.value, self._width, self._height,
+            self._dts, self._pts, self._duration,
+            self._shm_name.encode(), self._ticket
+        )
+
+    def serialize_parts(self):
+        return [self.serialize()]
+
+    def get_width(self):
+        return self._width
+    def get_height(self):
+        return self._height
+    def get_dts(self):
+        return self._dts
+    def get_pts(self):
+        return self._pts
+    def get_duration(self):
+        return self._duration
+    def get_shm_name(self):
+        return self._shm_name
+    def get_ticket(self):
+        return self._ticket
+
+class FrameBatchMsg(Msg):
+    """
+    Several frame messages sent together
+    """
+    def __init__(self, msgs):
+        self._type = MsgType.FRAME_BATCH
+        self._msgs = msgs
+
+    def serialize(self):
+        n_msgs = len(self._msgs)
+        msgs_parts = [msg.serialize_parts() for msg in self._msgs]
+        sizes = [sum(len(part) for part in parts) for parts in msgs_parts]
+        header = _BATCH_HEADER.pack(self._type.value, n_msgs)
+        s_sizes = struct.pack(f'<{n_msgs}I', *sizes)
+        # Single copy of the frames data into the message
+        return b''.join([header, s_sizes, *[part for parts in msgs_parts for part in parts]])
+
+    def get_msgs(self):
+        return self._msgs
+
 def deserialize(_msg):
     """
     Take a serialized message and returns the proper message
     """
-    msg = pickle.loads(_msg)
-    if msg["type"] == MsgType.RGB_IMAGE:
-        r_data = msg["data"]
-        if isinstance(r_data, bytes):
-            # Ref: https://numpy.org/doc/stable/reference/generated/numpy.ndarray.dumps.html#numpy.ndarray.dumps
-            r_data = pickle.loads(msg["data"])
-            # TODO: are the frames correct? is the ndtype=np.uint8 properly decoded?
-
-        return RgbImageMsg(
-            msg["width"],
-            msg["height"],
-            r_data,
-            msg["dts"],
-            msg["pts"],
-            msg["duration"],
+    if _msg[0] == MsgType.RGB_IMAGE.value:
+        _, width, height, dts, pts, duration = _FRAME_HEADER.unpack_from(_msg)
+        # NOTE: the data is a read only view over the received message
+        r_data = np.frombuffer(_msg, dtype=np.uint8, offset=_FRAME_HEADER.size)
+        return RgbImageMsg(width, height, r_data, dts, pts, duration)
+    elif _msg[0] == MsgType.SHARED_RGB_IMAGE.value:
+        _, width, height, dts, pts, duration, shm_name, ticket = _SHARED_FRAME_HEADER.unpack(_msg)
+        return SharedRgbImageMsg(
+            width, height, shm_name.rstrip(b'\0').decode(), ticket, dts, pts, duration
         )
-    elif msg["type"] == MsgType.CAPABILITIES:
+
+    elif _msg[0] == MsgType.FRAME_BATCH.value:
+        _, n_msgs = _BATCH_HEADER.unpack_from(_msg)
+        sizes = struct.unpack_from(f'<{n_msgs}I', _msg, _BATCH_HEADER.size)
+        offset = _BATCH_HEADER.size + 4 * n_msgs
+        view = memoryview(_msg)
+        msgs = []
+        for size in sizes:
+            msgs.append(deserialize(view[offset:offset + size]))
+            offset += size
+        return FrameBatchMsg(msgs)
+
+    msg = pickle.loads(_msg)
+    if msg["type"] == MsgType.CAPABILITIES:
         return StreamCapsMsg(msg["caps"])
     elif msg["type"] == MsgType.EOS:
         return EndOfStreamMsg()
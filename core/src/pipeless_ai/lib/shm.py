@@ -0,0 +1,192 @@
+import ctypes
+from collections import OrderedDict, deque
+import os
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+import numpy as np
+
+from pipeless_ai.lib.singleton import Singleton
+from pipeless_ai.lib.logger import logger
+
+# Where the POSIX shared memory segments are created
+SHM_PATH = '/dev/shm'
+
+def get_available_shm_size():
+    """
+    Returns the free space for shared memory segments, or None if unknown.
+    Writing to a segment that does not fit on it crashes the process (SIGBUS).
+    """
+    try:
+        stat = os.statvfs(SHM_PATH)
+    except OSError:
+        return None
+    return stat.f_bavail * stat.f_frsize
+
+class FrameRing(metaclass=Singleton):
+    """
+    Ring of shared memory slots used by the input to hand raw frames to the
+    workers without sending the pixels through the sockets.
+    A slot is taken when the input writes a frame on it and it is given back
+    when a worker notifies that it finished processing the frame.
+    Every time a slot is taken it gets a new ticket, notifications with an
+    old ticket are ignored. Slots not given back after slot_timeout seconds
+    (for example, when a worker dies) are reclaimed.
+    """
+    def __init__(self, n_slots=8, slot_timeout=10):
+        self._n_slots = n_slots
+        self._slot_timeout = slot_timeout
+        self._frame_shape = None
+        self._slot_size = 0
+        self._slots = {} # slot name -> (shared memory, address)
+        self._free = deque()
+        self._in_use = {} # slot name -> (ticket, acquire time)
+        # Slots of a previous allocation still in use by the workers
+        self._retired = {} # slot name -> shared memory
+        self._last_ticket = 0
+        # Slots are released from the thread sending the frames
+        self._lock = threading.Lock()
+
+    def set_frame_shape(self, height, width):
+        """
+        (Re)allocates the slots when the frame dimensions change.
+        Returns the size in bytes of the RGB frames.
+        Raises MemoryError when not even a single slot fits on the shared memory.
+        """
+        if (height, width) == self._frame_shape:
+            return self._slot_size
+        size = height * width * 3
+        with self._lock:
+            self._retire_slots()
+            n_slots = self._n_slots
+            available = get_available_shm_size()
+            if available is not None and available // size < n_slots:
+                n_slots = available // size
+                if n_slots < 1:
+                    raise MemoryError(f'No space on {SHM_PATH} for frames of {size} bytes')
+                logger.warning(f'Only {n_slots} frames fit on {SHM_PATH}. Consider increasing its size')
+            logger.debug(f'Allocating {n_slots} shared memory slots of {size} bytes')
+            for _ in range(n_slots):
+                shm = shared_memory.SharedMemory(create=True, size=size)
+                # The temporary ctypes object is only used to get the mmap address
+                address = ctypes.addressof(ctypes.c_char.from_buffer(shm.buf))
+                self._slots[shm.name] = (shm, address)
+                self._free.append(shm.name)
+            self._frame_shape = (height, width)
+            self._slot_size = size
+        return size
+
+    def acquire(self):
+        """
+        Returns the name and ticket of a free slot or None when all of them are in use
+        """
+        with self._lock:
+            if not self._free:
+                self._reclaim_slots()
+            if not self._free:
+                return None
+            name = self._free.popleft()
+            self._last_ticket += 1
+            self._in_use[name] = (self._last_ticket, time.monotonic())
+            return name, self._last_ticket
+
+    def release(self, name, ticket):
+        with self._lock:
+            in_use = self._in_use.get(name)
+            if in_use is None or in_use[0] != ticket:
+                # The slot was reclaimed before the notification arrived
+                return
+            del self._in_use[name]
+            if name in self._slots:
+                self._free.append(name)
+            else:
+                _unlink(self._retired.pop(name))
+
+    def write(self, name, src, size):
+        """
+        Copies size bytes from src (a ctypes object or address) into the slot
+        """
+        _, address = self._slots[name]
+        ctypes.memmove(address, src, size)
+
+    def close(self):
+        with self._lock:
+            self._retire_slots()
+            for shm in self._retired.values():
+                _unlink(shm)
+            self._retired = {}
+            self._in_use = {}
+
+    def _retire_slots(self):
+        # The slots in use are unlinked when the workers release them
+        for name, (shm, _) in self._slots.items():
+            if name in self._in_use:
+                self._retired[name] = shm
+            else:
+                _unlink(shm)
+        self._slots = {}
+        self._free.clear()
+        self._frame_shape = None
+        self._slot_size = 0
+
+    def _reclaim_slots(self):
+        deadline = time.monotonic() - self._slot_timeout
+        expired = [name for name, (_, acquire_time) in self._in_use.items() if acquire_time < deadline]
+        for name in expired:
+            logger.warning(f'Shared memory slot {name} was not released by the workers. Reclaiming it')
+            del self._in_use[name]
+            if name in self._slots:
+                self._free.append(name)
+            else:
+                _unlink(self._retired.pop(name))
+
+def _unlink(shm):
+    shm.close()
+    shm.unlink()
+
+class FrameRingReader(metaclass=Singleton):
+    """
+    Gives access to the frames written by the input on the FrameRing slots.
+    Keeps mapped the most recently used max_segments slots. The input allocates
+    new slots when the frame dimensions change, the old ones stop being used.
+    """
+    def __init__(self, max_segments=8):
+        self._max_segments = max_segments
+        self._segments = OrderedDict() # slot name -> (shared memory, ndarray view over the slot)
+
+    def get_frame(self, name, width, height):
+        """
+        Returns the frame or None when the slot does not exist anymore
+        """
+        segment = self._segments.get(name)
+        if segment is not None:
+            self._segments.move_to_end(name)
+            return segment[1]
+
+        try:
+            shm = shared_memory.SharedMemory(name=name)
+        except FileNotFoundError:
+            # The input reclaimed the slot or exited
+            return None
+        # The input owns the segment. Prevent the resource tracker
+        # of this process from unlinking it when exiting.
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        frame = np.frombuffer(
+            shm.buf, dtype=np.uint8, count=height * width * 3
+        ).reshape(height, width, 3)
+        self._segments[name] = (shm, frame)
+        if len(self._segments) > self._max_segments:
+            self._close_segment(next(iter(self._segments)))
+        return frame
+
+    def close(self):
+        for name in list(self._segments):
+            self._close_segment(name)
+
+    def _close_segment(self, name):
+        # The view must be released before closing the segment
+        shm = self._segments.pop(name)[0]
+        try:
+            shm.close()
+        except BufferError:
+            logger.warning(f'Shared memory segment {shm.name} is still in use')
@@ -3,9 +3,60 @@ import sys
 import traceback
 import numpy as np
 
-from pipeless_ai.lib.connection import InputPullSocket, OutputPushSocket
+from pipeless_ai.lib.config import Config
+from pipeless_ai.lib.connection import FreeSlotsSocket, InputPullSocket, OutputPushSocket
 from pipeless_ai.lib.logger import logger, update_logger_component
-from pipeless_ai.lib.messages import EndOfStreamMsg, RgbImageMsg, deserialize
+from pipeless_ai.lib.messages import EndOfStreamMsg, FrameBatchMsg, RgbImageMsg, SharedRgbImageMsg, deserialize
+from pipeless_ai.lib.shm import FrameRingReader
+
+def release_slot(msg):
+    """
+    Returns the frame message to the input, so it can reuse the shared memory slot
+    """
+    f_socket = FreeSlotsSocket('w')
+    f_socket.send(msg.serialize())
+
+def process_frame(user_app, msg):
+    """
+    Executes the user app on a frame message and forwards the result to the output
+    """
+    # TODO: we can use pynng recv_msg to get information about which pipe the message comes from, thus distinguish stream sources and route destinations
+    #       Usefull to support several input medias to the same app
+    height = msg.get_height()
+    width = msg.get_width()
+    if isinstance(msg, SharedRgbImageMsg):
+        # The frame is read directly from the input shared memory
+        ndframe = FrameRingReader().get_frame(msg.get_shm_name(), width, height)
+        if ndframe is None:
+            logger.warning(f'Shared memory slot {msg.get_shm_name()} not found. Dropping frame')
+            release_slot(msg)
+            return
+    else:
+        data = msg.get_data()
+        # The received data is read only and the app may modify the frame in place
+        ndframe = np.ndarray(
+            shape=(height, width, 3),
+            dtype=np.uint8, buffer=data
+        ).copy()
+
+    # Execute frame processing
+    updated_ndframe = ndframe
+    updated_ndframe = user_app._PipelessApp__pre_process(updated_ndframe)
+    updated_ndframe = user_app._PipelessApp__process(updated_ndframe)
+    updated_ndframe = user_app._PipelessApp__post_process(updated_ndframe)
+
+    o_msg = RgbImageMsg(
+        width, height, updated_ndframe,
+        msg.get_dts(), msg.get_pts(), msg.get_duration()
+    )
+    # Serializing copies the frame, so the shared slot can be released afterwards
+    s_o_msg = o_msg.serialize()
+    if isinstance(msg, SharedRgbImageMsg):
+        release_slot(msg)
+
+    # Forward the message to the output
+    s_socket = OutputPushSocket()
+    s_socket.send(s_o_msg)
 
 def fetch_and_process(user_app):
     """
@@ -17,28 +68,11 @@ def fetch_and_process(user_app):
     raw_msg = r_socket.recv()
     if raw_msg is not None:
         msg = deserialize(raw_msg)
-        if isinstance(msg, RgbImageMsg):
-            # TODO: we can use pynng recv_msg to get information about which pipe the message comes from, thus distinguish stream sources and route destinations
-            #       Usefull to support several input medias to the same app
-            height = msg.get_height()
-            width = msg.get_width()
-            data = msg.get_data()
-            ndframe = np.ndarray(
-                shape=(height, width, 3),
-                dtype=np.uint8, buffer=data
-            )
-
-            # Execute frame processing
-            updated_ndframe = ndframe
-            updated_ndframe = user_app._PipelessApp__pre_process(updated_ndframe)
-            updated_ndframe = user_app._PipelessApp__process(updated_ndframe)
-            updated_ndframe = user_app._PipelessApp__post_process(updated_ndframe)
-
-            msg.update_data(updated_ndframe)
-
-            # Forward the message to the output
-            s_socket = OutputPushSocket()
-            s_socket.send(msg.serialize())
+        if isinstance(msg, (RgbImageMsg, SharedRgbImageMsg)):
+            process_frame(user_app, msg)
+        elif isinstance(msg, FrameBatchMsg):
+            for frame_msg in msg.get_msgs():
+                process_frame(user_app, frame_msg)
         elif isinstance(msg, EndOfStreamMsg):
             logger.info('Worker iteration finished. About to reset')
             return False # Reset worker
@@ -67,7 +101,13 @@ def worker(user_module_path):
         logger.error('Missing app .py file path')
         sys.exit(1)
 
+    config = Config(None)
+    f_socket = None
     try:
+        if config.get_input().is_shared_memory_enabled():
+            f_socket = FreeSlotsSocket('w') # Waits for input
+            FrameRingReader(config.get_input().get_shared_memory_slots())
+
         while True:
             # Infinite worker loop
             continue_worker = True
@@ -87,4 +127,7 @@ def worker(user_module_path):
         r_socket = InputPullSocket()
         r_socket.close()
         s_socket = OutputPushSocket()
-        s_socket.close()
\ No newline at end of file
+        s_socket.close()
+        if f_socket is not None:
+            f_socket.close()
+            FrameRingReader().close()
\ No newline at end of file